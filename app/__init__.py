@@ -1,13 +1,18 @@
+import multiprocessing
+import threading
+from collections import OrderedDict
 from flask import Flask
 from .config import Config
-from .extensions import db, login_manager
+from .extensions import db, login_manager, OrjsonProvider
 from .routes import main_blueprint, chat_blueprint
 from .model import User
+from .services import warmup_embedding_models
 # from app.chat.routes import chat_bp
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
 
     # Initialize extensions
     db.init_app(app)
@@ -21,6 +26,18 @@ def create_app():
     with app.app_context():
         db.create_all()  # Create database tables
 
+    # RAG services shared by all requests, created on first use
+    app.extensions["rag"] = {
+        "intent": None,
+        "chatbots": OrderedDict(),  # collection name -> RAGChatbot, in LRU order
+        "lock": threading.Lock(),
+    }
+
+    # PDF worker processes re-import the entry module; only warm up the server
+    if app.config.get("WARMUP_EMBEDDINGS") and multiprocessing.parent_process() is None:
+        with app.app_context():
+            warmup_embedding_models()
+
     # Register blueprints
     app.register_blueprint(main_blueprint)
     app.register_blueprint(chat_blueprint)
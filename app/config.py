@@ -9,5 +9,11 @@ class Config:
     REMEMBER_COOKIE_DURATION = timedelta(minutes=5) 
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    WARMUP_EMBEDDINGS = True  # Load and warm the query embedding models at startup
+    MAX_CACHED_CHATBOTS = 16  # Per-collection chatbots kept in memory, least recently used evicted first
+    # Qdrant is queried over gRPC by default; set QDRANT_PREFER_GRPC=0 when
+    # the server only exposes the REST port
+    QDRANT_PREFER_GRPC = os.environ.get("QDRANT_PREFER_GRPC", "1") != "0"
+    QDRANT_GRPC_PORT = int(os.environ.get("QDRANT_GRPC_PORT", "6334"))
     UPLOAD_FOLDER = r"/Users/harshvardhan/RagChatbot/Uploads"
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from app.extensions import db
 from flask_login import UserMixin
+from sqlalchemy import func
 from datetime import datetime, timezone
 
 try:
@@ -7,14 +8,19 @@ try:
 except ImportError:
     from pytz import timezone as ZoneInfo  # fallback for older Python
 
-    
+
+
+def utcnow():
+    """Current UTC time, passed to columns as a callable so each row gets its own timestamp"""
+    return datetime.now(timezone.utc)
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(150), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utcnow)
 
     chats = db.relationship('Chat', backref='user', lazy=True, cascade='all, delete-orphan')
 
@@ -25,8 +31,8 @@ class PDF(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     file_name = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)  # local or cloud path
-    uploaded_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    uploaded_at = db.Column(db.DateTime, default=utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='processing')
 
     # Relationships
@@ -38,18 +44,26 @@ class PDF(db.Model):
 
 class Chat(db.Model):
     """Chat model for storing conversation threads"""
+    __table_args__ = (
+        db.Index('ix_chat_user_updated', 'user_id', 'updated_at'),  # get_chats: by user, newest first
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     pdf_id = db.Column(db.Integer, db.ForeignKey('pdf.id'), nullable=False)  # 👈 link to PDF
 
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utcnow)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
 
     # Relationships
     messages = db.relationship('Message', backref='chat', lazy=True, cascade='all, delete-orphan')
 
-    def to_dict(self):
+    def to_dict(self, message_count=None):
+        # Callers listing many chats pass counts from one grouped query;
+        # otherwise count in SQL rather than loading every message row.
+        if message_count is None:
+            message_count = db.session.query(func.count(Message.id)).filter(Message.chat_id == self.id).scalar()
         return {
             'id': self.id,
             'title': self.title,
@@ -57,7 +71,7 @@ class Chat(db.Model):
             'updated_at': self.updated_at.isoformat(),
             'pdf_id': self.pdf_id,
             'file_name': self.pdf.file_name if self.pdf else None,
-            'message_count': len(self.messages)
+            'message_count': message_count
         }
 
     def __repr__(self):
@@ -65,11 +79,15 @@ class Chat(db.Model):
 
 class Message(db.Model):
     """Message model for storing individual messages in a chat"""
+    __table_args__ = (
+        db.Index('ix_msg_chat_created', 'chat_id', 'created_at'),  # get_messages: by chat, oldest first
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
     sender = db.Column(db.String(10), nullable=False)  # 'user' or 'bot'
     text = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utcnow)
     
     def to_dict(self):
         """Convert message to dictionary for JSON response"""
@@ -99,14 +99,13 @@ def send_message(chat_id):
         sender='user',
         text=user_text
     )
-    db.session.add(user_message)
     
     chat.updated_at = datetime.now(timezone.utc) # Update chat's updated_at timestamp
     
     # Update chat title if it's the first message
     updated_title = None
-    message_count = Message.query.filter_by(chat_id=chat_id).count()
-    if message_count == 0:
+    has_messages = db.session.query(Message.query.filter_by(chat_id=chat_id).exists()).scalar()
+    if not has_messages:
         words = user_text.split()
         title = ' '.join(words[:4])
         if len(words) > 4:
@@ -115,8 +114,6 @@ def send_message(chat_id):
         print(f"Setting chat title to: {title}")
         updated_title = title
     
-    db.session.commit()
-    
     searcher = QdrantHybridSearcher(
         collection_name="pdf_hybrid_search",
         embedding_model="all-MiniLM-L6-v2",
@@ -125,21 +122,24 @@ def send_message(chat_id):
     hybrid_results = searcher.hybrid_search(user_text, limit=5)
 
     # Generate bot response (collect all chunks)
-    bot_text = ""
+    bot_parts = []
     try:
         for chunk in answer_gen.generate_answer_streaming(user_text, hybrid_results):
             if chunk.get("type") == "content":
-                bot_text += chunk.get("content", "")
+                bot_parts.append(chunk.get("content", ""))
     except Exception as e:
         print("Error generating bot response:", e, flush=True)
+        db.session.add(user_message)
+        db.session.commit()
         return jsonify({
             'success': False,
             'message': f'Error generating bot response: {str(e)}'
         }), 500
 
-    # Save bot response to DB
+    # Save both messages to DB
+    bot_text = "".join(bot_parts)
     bot_msg = Message(chat_id=chat_id, sender="bot", text=bot_text)
-    db.session.add(bot_msg)
+    db.session.add_all([user_message, bot_msg])
     db.session.commit()
 
     return jsonify({
@@ -1,13 +1,17 @@
-from flask import jsonify, request, current_app
+from flask import jsonify, request, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 import os
+import shutil
 from datetime import datetime, timezone
 from app.extensions import db
-from app.model import Chat, Message, PDF
+from app.model import Chat, Message, PDF, utcnow
 from . import chat_blueprint
 from ..services import *
 import time, uuid
+import orjson
 from threading import Thread
 
 current_collection_name = None
@@ -17,10 +21,23 @@ progress_store = {}
 @login_required
 def get_chats():
     """Get all chats for current user"""
-    chats = Chat.query.filter_by(user_id=current_user.id).order_by(Chat.updated_at.desc()).all()
+    chats = (
+        Chat.query.filter_by(user_id=current_user.id)
+        .options(joinedload(Chat.pdf))
+        .order_by(Chat.updated_at.desc())
+        .all()
+    )
+    # Message counts for all of the user's chats in one grouped query
+    message_counts = dict(
+        db.session.query(Message.chat_id, func.count(Message.id))
+        .join(Chat, Chat.id == Message.chat_id)
+        .filter(Chat.user_id == current_user.id)
+        .group_by(Message.chat_id)
+        .all()
+    )
     return jsonify({
         'success': True,
-        'chats': [chat.to_dict() for chat in chats]
+        'chats': [chat.to_dict(message_count=message_counts.get(chat.id, 0)) for chat in chats]
     })
 
 @chat_blueprint.route('/api/chats', methods=['POST'])
@@ -75,7 +92,7 @@ def delete_chat(chat_id):
 def get_messages(chat_id):
     """Get all messages for a specific chat"""
     chat = Chat.query.filter_by(id=chat_id, user_id=current_user.id).first_or_404()
-    messages = Message.query.filter_by(chat_id=chat_id).order_by(Message.created_at).all()
+    messages = Message.query.filter_by(chat_id=chat_id).order_by(Message.created_at, Message.id).all()
     
     return jsonify({
         'success': True,
@@ -98,42 +115,33 @@ def send_message(chat_id):
             'message': 'Message cannot be empty'
         }), 400
 
-    # Create user message
+    # Create user message; it is written together with the bot reply so the
+    # turn costs a single commit and no write transaction stays open while
+    # the answer is generated.
     user_message = Message(
         chat_id=chat_id,
         sender='user',
-        text=user_text
+        text=user_text,
+        created_at=utcnow()  # sent now, even though it is flushed after the reply
     )
-    db.session.add(user_message)
     
     chat.updated_at = datetime.now(timezone.utc) # Update chat's updated_at timestamp
     
-    db.session.commit()
-    rag_bot = RAGChatbot(collection_name=collection_name)
-
-    intent = IntentClassifier().predict_intent(user_text)
-    if intent == "Summarize Full Document":
-        # If intent is to summarize the full document, we handle it differently
-        print("Intent detected: Summarize Full Document")
-        bot_response = rag_bot.summarize_full_document()
-    else:
-        print("Intent detected: Q&A")
-        bot_response = rag_bot.answer_query(user_text)
-
     # Generate bot response (collect all chunks)
-    bot_text = ""
     try:
-        bot_text = bot_response
+        bot_text = "".join(generate_reply(user_text, collection_name)).strip()
     except Exception as e:
         print("Error generating bot response:", e, flush=True)
+        db.session.add(user_message)
+        db.session.commit()
         return jsonify({
             'success': False,
             'message': f'Error generating bot response: {str(e)}'
         }), 500
 
-    # Save bot response to DB
+    # Save both messages to DB
     bot_msg = Message(chat_id=chat_id, sender="bot", text=bot_text)
-    db.session.add(bot_msg)
+    db.session.add_all([user_message, bot_msg])
     db.session.commit()
 
     return jsonify({
@@ -142,6 +150,65 @@ def send_message(chat_id):
         'bot_message': bot_msg.to_dict(),
     })
 
+@chat_blueprint.route('/api/chats/<int:chat_id>/messages/stream', methods=['POST'])
+@login_required
+def stream_message(chat_id):
+    """Send a new message in a chat and stream the bot response as server-sent events"""
+    chat = Chat.query.filter_by(id=chat_id, user_id=current_user.id).first_or_404()
+    data = request.json
+    user_text = data.get('text', '')
+    collection_name = data.get('collection_name', None)
+
+    if not user_text.strip():
+        return jsonify({
+            'success': False,
+            'message': 'Message cannot be empty'
+        }), 400
+
+    user_message = Message(
+        chat_id=chat_id,
+        sender='user',
+        text=user_text,
+        created_at=utcnow()  # sent now, even though it is flushed after the reply
+    )
+
+    chat.updated_at = datetime.now(timezone.utc) # Update chat's updated_at timestamp
+
+    def events():
+        parts = []
+        saved = False
+        try:
+            try:
+                for chunk in generate_reply(user_text, collection_name):
+                    parts.append(chunk)
+                    yield sse_event({'delta': chunk})
+            except Exception as e:
+                print("Error generating bot response:", e, flush=True)
+                saved = True
+                db.session.add(user_message)
+                db.session.commit()
+                yield sse_event({'message': f'Error generating bot response: {str(e)}'}, event='error')
+                return
+
+            # Save both messages once the full reply is known
+            bot_msg = Message(chat_id=chat_id, sender="bot", text="".join(parts).strip())
+            saved = True
+            db.session.add_all([user_message, bot_msg])
+            db.session.commit()
+
+            yield sse_event({
+                'user_message': user_message.to_dict(),
+                'bot_message': bot_msg.to_dict(),
+            }, event='done')
+        finally:
+            # The client disconnected mid-stream (GeneratorExit): still keep
+            # the user's turn
+            if not saved:
+                db.session.add(user_message)
+                db.session.commit()
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
 @chat_blueprint.route('/api/uploadPdf', methods=['POST'])
 @login_required
 def upload_file():
@@ -194,7 +261,7 @@ def upload_file():
 
     app = current_app._get_current_object()
 
-    thread = Thread(target=background_process, args=(app, task_id, file_path, pdf.id))
+    thread = Thread(target=background_process, args=(app, task_id, file_path, pdf.id, current_collection_name))
     thread.start()
 
     return jsonify({
@@ -217,22 +284,28 @@ def get_progress():
     return jsonify({'progress': progress_store[task_id]}), 200
 
 
-def background_process(app, task_id, file_path, pdf_id):
+def background_process(app, task_id, file_path, pdf_id, collection_name):
+    # Chunking and indexing run in the PDF worker pool; this thread only
+    # waits on them and records progress.
+    chunks_dir = os.path.join(str(processor.output_dir), task_id)
     with app.app_context():
         # Step 1: File uploaded (already done)
         progress_store[task_id] = 25
 
-        # Step 2: Simulate process1
-        chunks = processor.process_pdf_for_rag(pdf_path=file_path, save_format="json")
-        progress_store[task_id] = 50
-
-        # Step 3: Simulate process2
-        indexer = QdrantRAGUploader(
-            file_path="./my_rag_chunks/rag_chunks.json",
-            collection_name=current_collection_name
-        )
-
-        success = indexer.run()
+        try:
+            # Step 2: Chunk the PDF into a per-task directory
+            chunks_path = run_in_pdf_pool(chunk_pdf, file_path, chunks_dir)
+            progress_store[task_id] = 50
+
+            # Step 3: Embed and index the chunks
+            success = run_in_pdf_pool(
+                index_chunks, chunks_path, collection_name,
+                app.config.get("QDRANT_PREFER_GRPC", True), app.config.get("QDRANT_GRPC_PORT", 6334)
+            )
+        finally:
+            # The chunks live in Qdrant now (or indexing failed); either way
+            # the per-task directory is no longer needed
+            shutil.rmtree(chunks_dir, ignore_errors=True)
 
         if not success:
             raise Exception("Failed to index PDF data")
@@ -250,4 +323,58 @@ def background_process(app, task_id, file_path, pdf_id):
 # Helper functions
 def allowed_file(filename, allowed_extensions):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
\ No newline at end of file
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+
+
+def sse_event(data, event=None):
+    """Format a payload as a server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {orjson.dumps(data).decode()}\n\n"
+
+
+def generate_reply(user_text, collection_name):
+    """Yield the bot reply to a user message chunk by chunk"""
+    rag_bot = get_chatbot(collection_name)
+
+    # Retrieval does not depend on the intent, so run it while the classifier
+    # decides; a summary request simply drops the result
+    context_future = rag_bot.prefetch_context(user_text)
+
+    intent = get_intent_classifier().predict_intent(user_text)
+    if intent == "Summarize Full Document":
+        # If intent is to summarize the full document, we handle it differently
+        print("Intent detected: Summarize Full Document")
+        context_future.cancel()
+        yield from rag_bot.summarize_full_document_stream()
+    else:
+        print("Intent detected: Q&A")
+        yield from rag_bot.answer_query_stream(user_text, context=context_future.result())
+
+
+def get_intent_classifier():
+    """Return the app-wide IntentClassifier, loading it on first use"""
+    rag = current_app.extensions["rag"]
+    with rag["lock"]:
+        if rag["intent"] is None:
+            rag["intent"] = IntentClassifier()
+        return rag["intent"]
+
+
+def get_chatbot(collection_name):
+    """Return the app-wide RAGChatbot for a collection, creating it on first use"""
+    rag = current_app.extensions["rag"]
+    chatbots = rag["chatbots"]
+    with rag["lock"]:
+        rag_bot = chatbots.get(collection_name)
+        if rag_bot is None:
+            rag_bot = RAGChatbot(
+                collection_name=collection_name,
+                qdrant_grpc_port=current_app.config.get("QDRANT_GRPC_PORT", 6334),
+                qdrant_prefer_grpc=current_app.config.get("QDRANT_PREFER_GRPC", True)
+            )
+            chatbots[collection_name] = rag_bot
+            while len(chatbots) > current_app.config.get("MAX_CACHED_CHATBOTS", 16):
+                chatbots.popitem(last=False)
+        else:
+            chatbots.move_to_end(collection_name)
+        return rag_bot
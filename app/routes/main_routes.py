@@ -6,6 +6,13 @@ from app.extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.exc import SQLAlchemyError
 import re
+import secrets
+
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+# Checked against when the email is unknown, so a login attempt costs the
+# same PBKDF2 work whether or not the account exists
+_DUMMY_PASSWORD_HASH = generate_password_hash(secrets.token_hex(16), method='pbkdf2:sha256')
 
 
 @main_blueprint.route('/')
@@ -26,8 +33,11 @@ def login():
         return jsonify({"success": False, "message": "Email and password are required."}), 400
     email = data.get('email')
     password = data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str) or not password:
+        return jsonify({"success": False, "message": "Email and password are required."}), 400
     user = User.query.filter_by(email=email).first()
-    if user and check_password_hash(user.password, password):
+    password_ok = check_password_hash(user.password if user else _DUMMY_PASSWORD_HASH, password)
+    if user and password_ok:
         login_user(user, remember=True)
         return jsonify({"success": True, "message": "Login successful!", "redirect_url":url_for('main.home')}), 200
     else:
@@ -44,7 +54,7 @@ def signup():
     password = data.get('password')
     name = data.get('name')
 
-    if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
+    if not _EMAIL_RE.match(email):
         return jsonify({"success": False, "message": "Invalid email format"}), 400
     if len(password) < 6:
         return jsonify({"success": False, "message": "Password too short"}), 400
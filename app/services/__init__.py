@@ -1,12 +1,19 @@
 from .extract import PDFRAGProcessor
 from .index import QdrantRAGUploader
+from .embeddings import get_embedding_models, warmup_embedding_models
 from .generation import RAGChatbot
 from .intent import IntentClassifier
+from .tasks import get_pdf_pool, run_in_pdf_pool, chunk_pdf, index_chunks
 import os 
 
 qdrant_path = r"/Users/harshvardhan/RagChatbot/instance/Qdrant"
 os.makedirs(qdrant_path, exist_ok=True)
 
+# Keep downloaded fastembed models out of the temp dir so restarts reuse them
+fastembed_cache_path = r"/Users/harshvardhan/RagChatbot/instance/fastembed"
+os.makedirs(fastembed_cache_path, exist_ok=True)
+os.environ.setdefault("FASTEMBED_CACHE_PATH", fastembed_cache_path)
+
 processor = PDFRAGProcessor(
         chunk_size=1000,
         chunk_overlap=200,
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    LRU cache keyed by query text, with a fallback lookup by dense embedding
+    so paraphrased queries can reuse an earlier result. Entries older than
+    ttl seconds (if set) are treated as misses.
+    """
+
+    def __init__(self, capacity=1000, threshold=0.92, ttl=None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries = OrderedDict()  # sha256(query) -> (matrix row, value)
+        self._lock = threading.Lock()
+        # Unit vectors live in one preallocated (capacity, dim) array; a new
+        # entry fills the next free row or the row of the evicted entry, so a
+        # lookup is a single matrix-vector product over the filled rows.
+        self._matrix = None
+        self._row_keys = []
+        self._expires = np.full(capacity, np.inf)
+
+    @staticmethod
+    def _key(query):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def get(self, query):
+        """Return the value cached for exactly this query, or None."""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expires[entry[0]] < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get_similar(self, vector):
+        """Return the value of the most similar cached query above the threshold, or None."""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._entries:
+                return None
+            filled = len(self._row_keys)
+            similarities = self._matrix[:filled] @ query
+            if self.ttl is not None:
+                similarities[self._expires[:filled] < time.monotonic()] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            key = self._row_keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def put(self, query, vector, value):
+        key = self._key(query)
+        unit_vector = self._normalize(vector)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((self.capacity, unit_vector.shape[0]), dtype=np.float32)
+
+            if key in self._entries:
+                row = self._entries[key][0]
+            elif len(self._row_keys) < self.capacity:
+                row = len(self._row_keys)
+                self._row_keys.append(key)
+            else:
+                _, (row, _) = self._entries.popitem(last=False)
+                self._row_keys[row] = key
+
+            self._matrix[row] = unit_vector
+            if self.ttl is not None:
+                self._expires[row] = time.monotonic() + self.ttl
+            self._entries[key] = (row, value)
+            self._entries.move_to_end(key)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class ExactCache:
+    """
+    LRU cache keyed by the exact query text, for values that must not be
+    reused for a merely similar query. Entries older than ttl seconds (if
+    set) are treated as misses.
+    """
+
+    def __init__(self, capacity=1000, ttl=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()  # sha256(query) -> (expiry, value)
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        """Return the value cached for exactly this query, or None."""
+        key = SemanticCache._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, query, value):
+        key = SemanticCache._key(query)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else np.inf
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
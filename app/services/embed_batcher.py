@@ -0,0 +1,65 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_BATCH = 16
+MAX_WAIT_MS = 8
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces query embeddings requested by concurrent chat requests into a
+    single batched model call. Queries arriving within MAX_WAIT_MS of each
+    other (up to MAX_BATCH) share one ONNX run.
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._run,
+            name=f"embed-batcher-{type(model).__name__}",
+            daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, query):
+        """Queue a query and return a Future resolving to its embedding."""
+        future = Future()
+        self._queue.put((query, future))
+        return future
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [
+                (query, future) for query, future in self._collect_batch()
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                vectors = list(self.model.query_embed([query for query, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,77 @@
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+from fastembed.sparse.sparse_embedding_base import SparseEmbedding
+
+COLBERT_DIM = 128
+
+# SQLite caps the number of bound parameters per statement
+_SELECT_BATCH = 500
+
+
+class EmbeddingStore:
+    """
+    On-disk cache of document embeddings keyed by a hash of the dense model
+    identity and the chunk text, so re-ingesting a mostly unchanged document
+    only embeds the new chunks, and switching between the fp32 and int8
+    dense models never reuses the other model's vectors.
+    Vectors are stored as raw float32/int64 bytes and loaded with frombuffer.
+    """
+
+    def __init__(self, path, model_id=""):
+        self._key_prefix = f"{model_id}\0".encode("utf-8")
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            # WAL lets the indexing workers read while another one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "hash TEXT PRIMARY KEY, dense BLOB, sparse_indices BLOB, "
+                "sparse_values BLOB, colbert BLOB)"
+            )
+
+    def key(self, text):
+        digest = hashlib.blake2b(self._key_prefix, digest_size=16)
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: (dense, sparse, colbert)} for the keys that are cached."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), _SELECT_BATCH):
+                batch = unique[i:i + _SELECT_BATCH]
+                rows = self._conn.execute(
+                    "SELECT hash, dense, sparse_indices, sparse_values, colbert "
+                    f"FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for key, dense, sparse_indices, sparse_values, colbert in rows:
+                    found[key] = (
+                        np.frombuffer(dense, dtype=np.float32),
+                        SparseEmbedding(
+                            values=np.frombuffer(sparse_values, dtype=np.float32),
+                            indices=np.frombuffer(sparse_indices, dtype=np.int64)
+                        ),
+                        np.frombuffer(colbert, dtype=np.float32).reshape(-1, COLBERT_DIM),
+                    )
+        return found
+
+    def put_many(self, items):
+        """Store an iterable of (key, dense, sparse, colbert) tuples."""
+        rows = [
+            (
+                key,
+                np.asarray(dense, dtype=np.float32).tobytes(),
+                np.asarray(sparse.indices, dtype=np.int64).tobytes(),
+                np.asarray(sparse.values, dtype=np.float32).tobytes(),
+                np.asarray(colbert, dtype=np.float32).tobytes(),
+            )
+            for key, dense, sparse, colbert in items
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
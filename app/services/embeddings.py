@@ -0,0 +1,82 @@
+import os
+import threading
+import onnxruntime as ort
+from fastembed import TextEmbedding, SparseTextEmbedding, LateInteractionTextEmbedding
+
+# int8 copy of the dense model written by quantizeModel.py; same 384-dim
+# output, so existing collections stay compatible.
+DENSE_INT8_MODEL_PATH = "./quantized_models/all-MiniLM-L6-v2-int8"
+
+# ONNX Runtime intra-op threads per model; unset leaves fastembed's default.
+# The three models often run at once, so a share of the cores is usually
+# better than all of them each.
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0")) or None
+
+# Embedding models are loaded once per process and shared by retrieval and
+# indexing alike.
+_MODEL_CACHE = {}
+_MODEL_LOCK = threading.Lock()
+# Identity of each cached model as it was actually loaded (e.g. which ONNX
+# file), fixed at load time like the model itself
+_MODEL_IDS = {}
+
+
+def _get_model(model_cls, model_name, model_id=None, **kwargs):
+    key = (model_cls.__name__, model_name)
+    model = _MODEL_CACHE.get(key)
+    if model is None:
+        with _MODEL_LOCK:
+            model = _MODEL_CACHE.get(key)
+            if model is None:
+                model = model_cls(model_name, **kwargs)
+                _MODEL_IDS[key] = model_id or model_name
+                _MODEL_CACHE[key] = model
+    return model
+
+
+def _onnx_kwargs():
+    # Use the GPU when this onnxruntime build has CUDA, the CPU otherwise
+    providers = ["CPUExecutionProvider"]
+    if "CUDAExecutionProvider" in ort.get_available_providers():
+        providers.insert(0, "CUDAExecutionProvider")
+    kwargs = {"providers": providers}
+    if EMBEDDING_THREADS:
+        kwargs["threads"] = EMBEDDING_THREADS
+    return kwargs
+
+
+DENSE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _dense_int8_available():
+    return os.path.exists(os.path.join(DENSE_INT8_MODEL_PATH, "model.onnx"))
+
+
+def dense_model_id():
+    """
+    Identify the dense model instance get_embedding_models() returns (fp32
+    name or int8 path), loading the models if needed. Taken from the loaded
+    instance, so an int8 file written later in the process does not change it.
+    """
+    get_embedding_models()
+    return _MODEL_IDS[(TextEmbedding.__name__, DENSE_MODEL_NAME)]
+
+
+def get_embedding_models():
+    """Return the shared dense, BM25 and ColBERT models, loading them on first use"""
+    dense_kwargs = _onnx_kwargs()
+    dense_id = DENSE_MODEL_NAME
+    if _dense_int8_available():
+        dense_kwargs["specific_model_path"] = DENSE_INT8_MODEL_PATH
+        dense_id = f"int8:{os.path.abspath(DENSE_INT8_MODEL_PATH)}"
+    return (
+        _get_model(TextEmbedding, DENSE_MODEL_NAME, model_id=dense_id, **dense_kwargs),
+        _get_model(SparseTextEmbedding, "Qdrant/bm25"),
+        _get_model(LateInteractionTextEmbedding, "colbert-ir/colbertv2.0", **_onnx_kwargs()),
+    )
+
+
+def warmup_embedding_models():
+    """Load the models and run one query through each, so the first chat does not pay for it"""
+    for model in get_embedding_models():
+        next(iter(model.query_embed("warmup")))
@@ -1,13 +1,195 @@
 import os
-import json
-import pickle
-from typing import List, Optional, Union
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Union
 from pathlib import Path
 
-from langchain_community.document_loaders import PyPDFLoader
+import orjson
+from pypdf import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+# PDFium is not thread-safe, even across different documents, so every call
+# into it (e.g. from load_pdfs' thread mode) is serialised behind this lock
+_PDFIUM_LOCK = threading.Lock()
+
+# Extracted page texts, keyed by a hash of the PDF bytes, so re-processing
+# the same file (e.g. with other chunk settings) skips extraction
+PAGE_CACHE_DIR = "./.cache/pdf_pages"
+
+
+def _page_cache_path(pdf_path: Path) -> Path:
+    """
+    Path of the page-text cache entry for a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Cache file path derived from the SHA-256 of the file contents and the extractor
+    """
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    extractor = "pypdf" if pdfium is None else "pdfium"
+    return Path(PAGE_CACHE_DIR) / f"{digest.hexdigest()}-{extractor}.json"
+
+
+def _extract_texts(pdf_path: Path) -> List[str]:
+    """
+    Extract the text of every page of a PDF.
+    
+    Uses PDFium through pypdfium2 when it is installed, pypdf otherwise.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        List of page texts, in page order
+    """
+    if pdfium is None:
+        return [page.extract_text() for page in PdfReader(str(pdf_path)).pages]
+    
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(str(pdf_path))
+        try:
+            texts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+            return texts
+        finally:
+            pdf.close()
+
+
+def _extract_pages(pdf_path: Path) -> List[Document]:
+    """
+    Extract a PDF's pages as Documents, reusing cached page text when the
+    same file was extracted before.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        List of Document objects, one per page
+    """
+    cache_path = _page_cache_path(pdf_path)
+    if cache_path.exists():
+        texts = orjson.loads(cache_path.read_bytes())
+        print(f"Using cached page text for {pdf_path.name}")
+    else:
+        texts = _extract_texts(pdf_path)
+        # Write to a temporary name first so a concurrent reader never sees
+        # a partial entry
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(orjson.dumps(texts))
+        os.replace(tmp_path, cache_path)
+    
+    return [
+        Document(page_content=text, metadata={'source': str(pdf_path), 'page': page})
+        for page, text in enumerate(texts)
+    ]
+
+
+def _load_pdf_documents(pdf_path: Union[str, Path]) -> List[Document]:
+    """
+    Extract the pages of one PDF file as Documents with file metadata attached.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        List of Document objects, one per page
+    """
+    pdf_path = Path(pdf_path)
+    
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    
+    if not pdf_path.suffix.lower() == '.pdf':
+        raise ValueError(f"File must be a PDF: {pdf_path}")
+    
+    print(f"Loading PDF: {pdf_path}")
+    documents = _extract_pages(pdf_path)
+    
+    # Add metadata
+    for doc in documents:
+        doc.metadata.update({
+            'source_file': str(pdf_path),
+            'file_name': pdf_path.name,
+            'total_pages': len(documents)
+        })
+    
+    print(f"Loaded {len(documents)} pages from {pdf_path.name}")
+    return documents
+
+
+class CachedLengthTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter whose merge step measures every split once.
+    
+    The stock _merge_splits calls the length function again for each split it
+    drops from the front of the overlap window; here the lengths are computed
+    up front and carried alongside the splits.
+    """
+    
+    def _merge_splits(self, splits: Iterable[str], separator: str) -> List[str]:
+        splits = list(splits)
+        lengths = [self._length_function(d) for d in splits]
+        separator_len = self._length_function(separator)
+        
+        docs = []
+        # Deques, so dropping splits from the front of the window is O(1)
+        current_doc: Deque[str] = deque()
+        current_lengths: Deque[int] = deque()
+        total = 0
+        for d, _len in zip(splits, lengths):
+            if (
+                total + _len + (separator_len if current_doc else 0)
+                > self._chunk_size
+            ):
+                if total > self._chunk_size:
+                    logger.warning(
+                        f"Created a chunk of size {total}, "
+                        f"which is longer than the specified {self._chunk_size}"
+                    )
+                if current_doc:
+                    doc = self._join_docs(list(current_doc), separator)
+                    if doc is not None:
+                        docs.append(doc)
+                    # Drop splits from the front until what is left fits in
+                    # the overlap and leaves room for the next split
+                    while total > self._chunk_overlap or (
+                        total + _len + (separator_len if current_doc else 0)
+                        > self._chunk_size
+                        and total > 0
+                    ):
+                        total -= current_lengths.popleft() + (
+                            separator_len if len(current_doc) > 1 else 0
+                        )
+                        current_doc.popleft()
+            current_doc.append(d)
+            current_lengths.append(_len)
+            total += _len + (separator_len if len(current_doc) > 1 else 0)
+        doc = self._join_docs(list(current_doc), separator)
+        if doc is not None:
+            docs.append(doc)
+        return docs
+
 
 class PDFRAGProcessor:
     """
@@ -36,11 +218,17 @@ class PDFRAGProcessor:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
+        # Always end on the "" separator so text with none of the custom
+        # separators can still be cut down to chunk_size
+        separators = list(separators) if separators else ["\n\n", "\n", " ", ""]
+        if separators[-1] != "":
+            separators.append("")
+        
         # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = CachedLengthTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            separators=separators or ["\n\n", "\n", " ", ""],
+            separators=separators,
             length_function=len,
         )
         
@@ -57,31 +245,48 @@ class PDFRAGProcessor:
         Returns:
             List of Document objects containing the extracted text
         """
-        pdf_path = Path(pdf_path)
-        
-        if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        documents = _load_pdf_documents(pdf_path)
+        self.documents.extend(documents)
+        return documents
+    
+    def load_pdfs(
+        self,
+        pdf_paths: Iterable[Union[str, Path]],
+        num_workers: Optional[int] = None,
+        use_processes: bool = True
+    ) -> List[Document]:
+        """
+        Load several PDF files in parallel.
         
-        if not pdf_path.suffix.lower() == '.pdf':
-            raise ValueError(f"File must be a PDF: {pdf_path}")
+        By default the files are parsed in the shared PDF ingestion pool
+        (tasks.get_pdf_pool), whose worker processes are started once and
+        reused, so no call pays for spawning and importing the app again.
+        Threads only help with the pypdf fallback and page-cache hits: PDFium
+        calls are serialised across threads, one document at a time.
         
-        print(f"Loading PDF: {pdf_path}")
-        loader = PyPDFLoader(str(pdf_path))
-        documents = loader.load()
+        Args:
+            pdf_paths: Paths to the PDF files
+            num_workers: Number of threads when use_processes is False
+                (defaults to the CPU count); the process pool has a fixed size
+            use_processes: Parse in the shared process pool; set False to use threads
+            
+        Returns:
+            List of Document objects from all files, in input order
+        """
+        pdf_paths = list(pdf_paths)
         
-        # Add metadata
-        for doc in documents:
-            doc.metadata.update({
-                'source_file': str(pdf_path),
-                'file_name': pdf_path.name,
-                'total_pages': len(documents)
-            })
+        if use_processes:
+            # Imported here: tasks imports this module
+            from .tasks import get_pdf_pool
+            results = list(get_pdf_pool().map(_load_pdf_documents, pdf_paths))
+        else:
+            num_workers = min(num_workers or os.cpu_count() or 1, max(len(pdf_paths), 1))
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(_load_pdf_documents, pdf_paths))
         
+        documents = [doc for file_documents in results for doc in file_documents]
         self.documents.extend(documents)
-        print(f"Loaded {len(documents)} pages from {pdf_path.name}")
-        
         return documents
-    
 
     
     def chunk_documents(self, documents: Optional[List[Document]] = None) -> List[Document]:
@@ -132,26 +337,28 @@ class PDFRAGProcessor:
         
         output_path = self.output_dir / filename
         
-        # Convert chunks to serializable format
-        chunks_data = []
-        for chunk in self.chunks:
-            chunks_data.append({
-                'content': chunk.page_content,
-                'metadata': chunk.metadata
-            })
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks_data, f, indent=2, ensure_ascii=False)
+        # Write the array one chunk at a time rather than building a list of
+        # dicts for the whole corpus first
+        with open(output_path, 'wb', buffering=1 << 20) as f:
+            f.write(b'[')
+            for i, chunk in enumerate(self.chunks):
+                if i:
+                    f.write(b',')
+                f.write(orjson.dumps({
+                    'content': chunk.page_content,
+                    'metadata': chunk.metadata
+                }, option=orjson.OPT_SERIALIZE_NUMPY))
+            f.write(b']')
         
-        print(f"Saved {len(chunks_data)} chunks to {output_path}")
+        print(f"Saved {len(self.chunks)} chunks to {output_path}")
         return str(output_path)
     
-    def save_chunks_pickle(self, filename: str = "chunks.pkl") -> str:
+    def save_chunks_jsonl(self, filename: str = "chunks.jsonl") -> str:
         """
-        Save chunks to a pickle file (preserves Document objects).
+        Save chunks to a JSON Lines file (one chunk object per line).
         
         Args:
-            filename: Name of the output pickle file
+            filename: Name of the output JSONL file
             
         Returns:
             Path to the saved file
@@ -161,8 +368,12 @@ class PDFRAGProcessor:
         
         output_path = self.output_dir / filename
         
-        with open(output_path, 'wb') as f:
-            pickle.dump(self.chunks, f)
+        with open(output_path, 'wb', buffering=1 << 20) as f:
+            for chunk in self.chunks:
+                f.write(orjson.dumps({
+                    'content': chunk.page_content,
+                    'metadata': chunk.metadata
+                }, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY))
         
         print(f"Saved {len(self.chunks)} chunks to {output_path}")
         return str(output_path)
@@ -226,11 +437,16 @@ class PDFRAGProcessor:
         
         Args:
             pdf_path: Path to PDF file
-            save_format: Format to save chunks ('json', 'pickle', 'text', or 'all')
+            save_format: Format to save chunks ('json', 'jsonl', 'text', or 'all')
             
         Returns:
             List of chunked Document objects ready for embedding
         """
+        if save_format not in ("json", "jsonl", "text", "all"):
+            raise ValueError(
+                f"Unsupported save_format: {save_format!r} (expected 'json', 'jsonl', 'text' or 'all')"
+            )
+        
         # Clear any previous data
         self.documents = []
         self.chunks = []
@@ -247,8 +463,8 @@ class PDFRAGProcessor:
         if save_format == "json" or save_format == "all":
             self.save_chunks_json("rag_chunks.json")
         
-        if save_format == "pickle" or save_format == "all":
-            self.save_chunks_pickle("rag_chunks.pkl")
+        if save_format == "jsonl" or save_format == "all":
+            self.save_chunks_jsonl("rag_chunks.jsonl")
         
         if save_format == "text" or save_format == "all":
             self.save_chunks_text("rag_chunks.txt")
@@ -269,25 +485,23 @@ class PDFRAGProcessor:
         file_path = Path(file_path)
         
         if file_path.suffix == '.json':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                chunks_data = json.load(f)
-            
-            chunks = []
-            for chunk_data in chunks_data:
-                doc = Document(
-                    page_content=chunk_data['content'],
-                    metadata=chunk_data['metadata']
-                )
-                chunks.append(doc)
-            
-            self.chunks = chunks
+            with open(file_path, 'rb') as f:
+                chunks_data = orjson.loads(f.read())
             
-        elif file_path.suffix == '.pkl':
+        elif file_path.suffix == '.jsonl':
             with open(file_path, 'rb') as f:
-                self.chunks = pickle.load(f)
+                chunks_data = [orjson.loads(line) for line in f if line.strip()]
         
         else:
-            raise ValueError("Unsupported file format. Use .json or .pkl files.")
+            raise ValueError("Unsupported file format. Use .json or .jsonl files.")
+        
+        self.chunks = [
+            Document(
+                page_content=chunk_data['content'],
+                metadata=chunk_data['metadata']
+            )
+            for chunk_data in chunks_data
+        ]
         
         print(f"Loaded {len(self.chunks)} chunks from {file_path}")
         return self.chunks
@@ -1,13 +1,105 @@
-import requests
-from qdrant_client import QdrantClient, models
-from fastembed import TextEmbedding, SparseTextEmbedding, LateInteractionTextEmbedding
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import accumulate
+import httpx
+import numpy as np
+import orjson
+from qdrant_client import models
 from transformers import AutoTokenizer
+from .cache import ExactCache, SemanticCache
+from .embed_batcher import EmbeddingBatcher
+from .embeddings import get_embedding_models
+from .qdrant import get_qdrant_client
+
+OLLAMA_GENERATE_URL = "http://localhost:11434/api/generate"
+
+# Keep gemma loaded between chat turns. A resident model also keeps its KV
+# cache, so a prompt that starts with the same bytes as the previous one
+# (same context or document) skips prefill for that prefix.
+OLLAMA_KEEP_ALIVE = "30m"
+
+_QA_PROMPT_HEAD = "Answer the question based on the following context:\n\n"
+_SUMMARY_PROMPT_HEAD = "Summarize the following document:\n\n"
+
+# Rough characters per token for English text, used to pick summary chunks
+# before the one exact tokenizer pass.
+_CHARS_PER_TOKEN = 4
+
+# One pooled client for every Ollama call, so chat turns reuse keep-alive
+# connections instead of opening a new TCP connection per request.
+_OLLAMA = httpx.Client(
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    timeout=httpx.Timeout(60.0, read=None),
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Background retrievals started by prefetch_context.
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-retrieval")
+
+# Search the int8 vectors, then rescore the oversampled candidates against
+# the float32 originals.
+_RESCORE_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+
+# One micro-batcher per model: concurrent requests share batched ONNX runs,
+# and the three models embed a query side by side on their own threads.
+_BATCHERS = {}
+_BATCHER_LOCK = threading.Lock()
+
+
+def _get_batcher(model):
+    with _BATCHER_LOCK:
+        batcher = _BATCHERS.get(id(model))
+        if batcher is None:
+            batcher = EmbeddingBatcher(model)
+            _BATCHERS[id(model)] = batcher
+    return batcher
+
+
+# Each chatbot caches retrieved contexts and generated answers for its
+# collection, shared across requests and freed with the chatbot (the app
+# keeps a bounded LRU of chatbots, MAX_CACHED_CHATBOTS). Contexts are also
+# reused for paraphrased queries; answers only for the exact same query text
+# (near-paraphrases can mean the opposite, e.g. "maximum" vs "minimum
+# dosage"), and they expire so one generation is not pinned forever.
+ANSWER_CACHE_TTL = 3600
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    # Only summaries count tokens, so Q&A-only processes never load it, and
+    # every chatbot shares the one instance.
+    return AutoTokenizer.from_pretrained('distilbert-base-uncased', use_fast=True)
+
+
+def _ollama_response_text(response):
+    # Ollama reports failures (model not pulled, out of memory...) as an
+    # HTTP error status and/or an "error" field instead of a response.
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    if "error" in data:
+        raise RuntimeError(f"Ollama error: {data['error']}")
+    return data.get("response", "").strip()
+
+
+def _payload_text(payload):
+    # Only stringify the whole payload when it has no text field.
+    text = payload.get("text")
+    return text if text is not None else str(payload)
+
 
 class RAGChatbot:
-    def __init__(self, collection_name="myRag", qdrant_host="localhost", qdrant_port=6333):
+    def __init__(self, collection_name="myRag", qdrant_host="localhost", qdrant_port=6333,
+                 qdrant_grpc_port=6334, qdrant_prefer_grpc=True):
         self.collection_name = collection_name
-        self.tokenizer = AutoTokenizer.from_pretrained('distilbert-base-uncased')
-        self.client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        self.client = get_qdrant_client(
+            qdrant_host, qdrant_port, grpc_port=qdrant_grpc_port, prefer_grpc=qdrant_prefer_grpc
+        )
 
         if not self.client.collection_exists(self.collection_name):
             raise Exception(f"Collection '{self.collection_name}' does not exist. Please create it first.")
@@ -16,21 +108,53 @@ class RAGChatbot:
         print(f"[INFO] Collection '{self.collection_name}' exists with {collection_count.count} documents.")
 
         # Initialize embedding models
-        self.dense_embedding_model = TextEmbedding("sentence-transformers/all-MiniLM-L6-v2")
-        self.bm25_embedding_model = SparseTextEmbedding("Qdrant/bm25")
-        self.late_interaction_embedding_model = LateInteractionTextEmbedding("colbert-ir/colbertv2.0")
+        (
+            self.dense_embedding_model,
+            self.bm25_embedding_model,
+            self.late_interaction_embedding_model,
+        ) = get_embedding_models()
+        self.dense_batcher = _get_batcher(self.dense_embedding_model)
+        self.bm25_batcher = _get_batcher(self.bm25_embedding_model)
+        self.late_interaction_batcher = _get_batcher(self.late_interaction_embedding_model)
+        self.context_cache = SemanticCache()
+        self.answer_cache = ExactCache(ttl=ANSWER_CACHE_TTL)
 
-    def _embed_query(self, query):
-        dense_vector = next(self.dense_embedding_model.query_embed(query))
-        sparse_vector = next(self.bm25_embedding_model.query_embed(query))
-        late_vector = next(self.late_interaction_embedding_model.query_embed(query))
-        return dense_vector, sparse_vector, late_vector
+    def _query_vector(self, query):
+        # Contiguous float32 once here, so neither the cache scan nor the
+        # Qdrant request serialisation has to copy or cast it again.
+        return np.ascontiguousarray(self.dense_batcher.submit(query).result(), dtype=np.float32)
+
+    def _get_context(self, query):
+        context = self.context_cache.get(query)
+        if context is not None:
+            return context
+
+        # Queue the BM25 and ColBERT embeddings alongside the dense vector,
+        # which is awaited first because it doubles as the semantic cache key.
+        sparse_future = self.bm25_batcher.submit(query)
+        late_future = self.late_interaction_batcher.submit(query)
+        dense_vector = self._query_vector(query)
+
+        context = self.context_cache.get_similar(dense_vector)
+        if context is None:
+            # ColBERT yields one (n_tokens, 128) matrix per query; keep it a
+            # single float32 array so the client converts it in one call.
+            late_vector = np.ascontiguousarray(late_future.result(), dtype=np.float32)
+            if late_vector.ndim != 2:
+                raise ValueError(f"Expected a 2D late-interaction query matrix, got shape {late_vector.shape}")
+            context = self._retrieve_context(dense_vector, sparse_future.result(), late_vector)
+        else:
+            sparse_future.cancel()
+            late_future.cancel()
+        self.context_cache.put(query, dense_vector, context)
+        return context
 
     def _retrieve_context(self, dense_vector, sparse_vector, late_vector):
         prefetch = [
             models.Prefetch(
                 query=dense_vector,
                 using="all-MiniLM-L6-v2",
+                params=_RESCORE_PARAMS,
                 limit=10,
             ),
             models.Prefetch(
@@ -45,63 +169,162 @@ class RAGChatbot:
             query=late_vector,
             using="colbertv2.0",
             prefetch=prefetch,
+            search_params=_RESCORE_PARAMS,
             limit=5,
             with_payload=True
         )
 
-        context_docs = [
-            point.payload.get("text", str(point.payload)) for point in results.points
-        ]
-        return "\n\n".join(context_docs)
+        return "\n\n".join(_payload_text(point.payload) for point in results.points)
+
+    def _build_qa_prompt(self, query, context):
+        return "".join((_QA_PROMPT_HEAD, context, "\n\nQuestion: ", query, "\nAnswer:"))
 
     def _generate_answer_with_ollama(self, query, context, model="gemma3:4b"):
-        prompt = f"Answer the question based on the following context:\n\n{context}\n\nQuestion: {query}\nAnswer:"
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
+        prompt = self._build_qa_prompt(query, context)
+        response = _OLLAMA.post(
+            OLLAMA_GENERATE_URL,
+            content=orjson.dumps({
                 "model": model,
                 "prompt": prompt,
-                "stream": False
-            }
+                "stream": False,
+                "keep_alive": OLLAMA_KEEP_ALIVE
+            }),
+            headers=_JSON_HEADERS
         )
-        return response.json().get("response", "").strip()
+        return _ollama_response_text(response)
+
+    def _stream_from_ollama(self, prompt, model="gemma3:4b"):
+        with _OLLAMA.stream(
+            "POST",
+            OLLAMA_GENERATE_URL,
+            content=orjson.dumps({
+                "model": model,
+                "prompt": prompt,
+                "stream": True,
+                "keep_alive": OLLAMA_KEEP_ALIVE
+            }),
+            headers=_JSON_HEADERS
+        ) as response:
+            response.raise_for_status()
+            # Split the NDJSON stream on raw bytes rather than decoding every
+            # line to str; only the response field is ever decoded.
+            buffer = bytearray()
+            done = False
+            for data in response.iter_bytes():
+                buffer += data
+                start = 0
+                while (end := buffer.find(b"\n", start)) != -1:
+                    line = bytes(buffer[start:end])
+                    start = end + 1
+                    # Every token is its own line; skip anything that cannot
+                    # carry text or an error before paying for a parse.
+                    if b'"error"' in line:
+                        error = orjson.loads(line).get("error")
+                        if error is not None:
+                            raise RuntimeError(f"Ollama error: {error}")
+                    if b'"response"' not in line:
+                        continue
+                    chunk = orjson.loads(line)
+                    text = chunk["response"]
+                    if text:
+                        yield text
+                    done = done or chunk.get("done", False)
+                del buffer[:start]
+            # A stream cut off before the final "done" line is an error, not
+            # a shorter answer
+            if not done:
+                raise RuntimeError("Ollama stream ended before the generation was done")
 
     def answer_query(self, query):
-        dense_vector, sparse_vector, late_vector = self._embed_query(query)
-        context = self._retrieve_context(dense_vector, sparse_vector, late_vector)
+        context = self._get_context(query)
         return self._generate_answer_with_ollama(query, context)
-    
-    def summarize_full_document(self, model="gemma3:4b", max_tokens=120000):
-        results = self.client.scroll(
-            collection_name=self.collection_name,
-            limit=1000,
-            with_payload=True
-        )
 
-        all_chunks = [point.payload.get("text", str(point.payload)) for point in results[0]]
+    def prefetch_context(self, query):
+        """Start retrieving the context for a query in the background and return a Future for it"""
+        return _RETRIEVAL_POOL.submit(self._get_context, query)
+
+    def answer_query_stream(self, query, context=None):
+        answer = self.answer_cache.get(query)
+        if answer is not None:
+            yield answer
+            return
+
+        if context is None:
+            context = self._get_context(query)
+        parts = []
+        for text in self._stream_from_ollama(self._build_qa_prompt(query, context)):
+            parts.append(text)
+            yield text
+        # Only a completely streamed (the stream raises otherwise), non-empty
+        # answer is cached
+        answer = "".join(parts)
+        if answer.strip():
+            self.answer_cache.put(query, answer)
+    
+    def _iter_all_texts(self, page=256):
+        """Yield the collection's chunk texts one scroll page (list) at a time."""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=page,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            if points:
+                yield [_payload_text(point.payload) for point in points]
+            if offset is None:
+                return
 
-        document_text = ""
-        total_tokens = 0
+    def _build_summary_prompt(self, max_tokens):
+        selected = []
+        estimated_tokens = 0
 
-        for chunk in all_chunks:
-            tokens = len(self.tokenizer.encode(chunk))
-            if total_tokens + tokens <= max_tokens:
-                document_text += chunk + "\n\n"
-                total_tokens += tokens
-            else:
+        for texts in self._iter_all_texts():
+            # Choose chunks with a cheap characters-per-token estimate; the
+            # prefix sums give how many of the page's chunks fit the budget
+            cumulative = list(accumulate(len(text) // _CHARS_PER_TOKEN for text in texts))
+            cutoff = bisect_right(cumulative, max_tokens - estimated_tokens)
+            # Keep the boundary chunk too, the exact cut happens below
+            selected.extend(texts[:cutoff + 1])
+            if cutoff < len(texts):
                 break
+            estimated_tokens += cumulative[-1]
 
-        prompt = f"Summarize the following document:\n\n{document_text}\n\nSummary:"
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
+        document_text = "\n\n".join(selected)
+
+        # One precise tokenizer pass over the chosen text; if the estimate
+        # overshot, cut at the character offset of the last token that fits
+        offsets = _get_tokenizer()(
+            document_text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )["offset_mapping"]
+        if len(offsets) > max_tokens:
+            document_text = document_text[:offsets[max_tokens - 1][1]] if max_tokens > 0 else ""
+
+        return "".join((_SUMMARY_PROMPT_HEAD, document_text, "\n\nSummary:"))
+
+    def summarize_full_document(self, model="gemma3:4b", max_tokens=120000):
+        prompt = self._build_summary_prompt(max_tokens)
+        response = _OLLAMA.post(
+            OLLAMA_GENERATE_URL,
+            content=orjson.dumps({
                 "model": model,
                 "prompt": prompt,
-                "stream": False
-            }
+                "stream": False,
+                "keep_alive": OLLAMA_KEEP_ALIVE
+            }),
+            headers=_JSON_HEADERS
         )
 
-        return response.json().get("response", "").strip()
+        return _ollama_response_text(response)
+
+    def summarize_full_document_stream(self, model="gemma3:4b", max_tokens=120000):
+        yield from self._stream_from_ollama(self._build_summary_prompt(max_tokens), model=model)
 
 
 # --- Usage Example ---
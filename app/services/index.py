@@ -1,46 +1,97 @@
-import json
 import uuid
 import os
+import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-from qdrant_client import QdrantClient, models
+from qdrant_client import models
 from qdrant_client.models import PointStruct
-from fastembed import TextEmbedding, SparseTextEmbedding, LateInteractionTextEmbedding
+from .embed_store import EmbeddingStore
+from .embeddings import dense_model_id, get_embedding_models
+from .qdrant import get_qdrant_client
+
+# Point ids derive from the chunk text, so re-ingesting a chunk overwrites its
+# point instead of adding a duplicate
+POINT_ID_NAMESPACE = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+
+DENSE_VECTOR_SIZE = 384
+COLBERT_VECTOR_SIZE = 128
+
+# int8 copies of the vectors stay in RAM for search; the float32 originals
+# live on disk and are only read to rescore the top candidates
+INT8_QUANTIZATION = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True,
+    )
+)
 
 
 class QdrantRAGUploader:
-    def __init__(self, file_path, collection_name="myRag", host="localhost", port=6333, timeout=60.0):
+    def __init__(self, file_path, collection_name="myRag", host="localhost", port=6333, timeout=60.0,
+                 embedding_cache_path="./embedding_cache.sqlite3", grpc_port=6334, prefer_grpc=True):
         self.file_path = file_path
         self.collection_name = collection_name
-        self.client = QdrantClient(host=host, port=port, timeout=timeout)
+        self.client = get_qdrant_client(host, port, timeout, grpc_port=grpc_port, prefer_grpc=prefer_grpc)
+        self.embedding_store = (
+            EmbeddingStore(embedding_cache_path, model_id=dense_model_id()) if embedding_cache_path else None
+        )
         self.texts = []
         self.chunks = []
+        self.cache_hits = 0
 
-        # Initialize embedding models
-        self.dense_embedding_model = TextEmbedding("sentence-transformers/all-MiniLM-L6-v2")
-        self.bm25_embedding_model = SparseTextEmbedding("Qdrant/bm25")
-        self.late_interaction_embedding_model = LateInteractionTextEmbedding("colbert-ir/colbertv2.0")
+        # Same model instances the chatbot queries with
+        (
+            self.dense_embedding_model,
+            self.bm25_embedding_model,
+            self.late_interaction_embedding_model
+        ) = get_embedding_models()
 
     def load_chunks(self):
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            self.chunks = json.load(f)
-            self.texts = [chunk["content"] for chunk in self.chunks]
-            print(f"[INFO] {len(self.chunks)} chunks loaded from file")
+        with open(self.file_path, "rb") as f:
+            if str(self.file_path).endswith(".jsonl"):
+                # One chunk object per line; parsed as the file is read
+                self.chunks = [orjson.loads(line) for line in f if line.strip()]
+            else:
+                self.chunks = orjson.loads(f.read())
+        self.texts = [chunk["content"] for chunk in self.chunks]
+        print(f"[INFO] {len(self.chunks)} chunks loaded from file")
+
+    def _collection_matches_schema(self):
+        params = self.client.get_collection(self.collection_name).config.params
+        vectors = params.vectors if isinstance(params.vectors, dict) else {}
+        sizes = {name: vector.size for name, vector in vectors.items()}
+        return (
+            sizes == {"all-MiniLM-L6-v2": DENSE_VECTOR_SIZE, "colbertv2.0": COLBERT_VECTOR_SIZE}
+            and "bm25" in (params.sparse_vectors or {})
+        )
 
     def setup_collection(self):
+        # Reuse an existing collection (upserts are idempotent); only rebuild
+        # it when its vectors do not match what this uploader writes
         if self.client.collection_exists(self.collection_name):
+            if self._collection_matches_schema():
+                print(f"[INFO] Collection '{self.collection_name}' already exists, reusing it.")
+                return
             self.client.delete_collection(collection_name=self.collection_name)
-            print(f"[INFO] Collection '{self.collection_name}' deleted successfully.")
+            print(f"[INFO] Collection '{self.collection_name}' had a different schema and was deleted.")
 
         self.client.create_collection(
             self.collection_name,
             vectors_config={
                 "all-MiniLM-L6-v2": models.VectorParams(
-                    size=384,
+                    size=DENSE_VECTOR_SIZE,
                     distance=models.Distance.COSINE,
+                    on_disk=True,
+                    quantization_config=INT8_QUANTIZATION,
+                    hnsw_config=models.HnswConfigDiff(on_disk=True, m=16, ef_construct=100),
                 ),
                 "colbertv2.0": models.VectorParams(
-                    size=128,
+                    size=COLBERT_VECTOR_SIZE,
                     distance=models.Distance.COSINE,
+                    on_disk=True,
+                    quantization_config=INT8_QUANTIZATION,
                     multivector_config=models.MultiVectorConfig(
                         comparator=models.MultiVectorComparator.MAX_SIM,
                     ),
@@ -51,40 +102,81 @@ class QdrantRAGUploader:
                 "bm25": models.SparseVectorParams(
                     modifier=models.Modifier.IDF,
                 )
-            }
+            },
+            on_disk_payload=True
         )
         print(f"[INFO] Collection '{self.collection_name}' created successfully.")
 
-    def embed_texts(self):
-        print("[INFO] Generating embeddings...")
-        self.dense_vecs = list(self.dense_embedding_model.embed(doc for doc in self.texts))
-        self.sparse_vecs = list(self.bm25_embedding_model.embed(doc for doc in self.texts))
-        self.colbert_vecs = list(self.late_interaction_embedding_model.embed(doc for doc in self.texts))
-
-    def insert_into_qdrant(self, batch_size=10):
-        print(f"[INFO] Inserting {len(self.chunks)} points into Qdrant in batches of {batch_size}...")
-        for i in tqdm(range(0, len(self.chunks), batch_size), desc="Uploading batches"):
-            batch_points = []
-            for j in range(i, min(i + batch_size, len(self.chunks))):
-                point = PointStruct(
-                    id=str(uuid.uuid4()),
-                    payload={"text": self.chunks[j]["content"]},
-                    vector={
-                        "all-MiniLM-L6-v2": self.dense_vecs[j].tolist(),
-                        "bm25": self.sparse_vecs[j].as_object(),
-                        "colbertv2.0": self.colbert_vecs[j].tolist(),
-                    }
-                )
-                batch_points.append(point)
-            self.client.upsert(collection_name=self.collection_name, points=batch_points)
+    def _embed_with_models(self, pool, texts, batch_size):
+        # Run the three models side by side (ONNX Runtime releases the GIL)
+        dense = pool.submit(lambda: list(self.dense_embedding_model.embed(texts, batch_size=batch_size)))
+        sparse = pool.submit(lambda: list(self.bm25_embedding_model.embed(texts, batch_size=batch_size)))
+        colbert = pool.submit(lambda: list(self.late_interaction_embedding_model.embed(texts, batch_size=batch_size)))
+        return dense.result(), sparse.result(), colbert.result()
+
+    def _embed_batch(self, pool, texts, batch_size):
+        if self.embedding_store is None:
+            return self._embed_with_models(pool, texts, batch_size)
+
+        # Only chunks never seen before go through the models
+        keys = [self.embedding_store.key(text) for text in texts]
+        cached = self.embedding_store.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.cache_hits += len(keys) - len(missing)
+
+        if missing:
+            new_items = list(zip(missing, *self._embed_with_models(pool, list(missing.values()), batch_size)))
+            self.embedding_store.put_many(new_items)
+            cached.update((key, vectors) for key, *vectors in new_items)
+
+        return (
+            [cached[key][0] for key in keys],
+            [cached[key][1] for key in keys],
+            [cached[key][2] for key in keys],
+        )
+
+    def _iter_points(self, batch_size):
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            for start in range(0, len(self.chunks), batch_size):
+                texts = self.texts[start:start + batch_size]
+                dense, sparse, colbert = self._embed_batch(pool, texts, batch_size)
+                # One tolist() call for the whole batch of dense vectors
+                dense_rows = np.asarray(dense, dtype=np.float32).tolist()
+                for text, dense_row, sparse_vec, colbert_vec in zip(texts, dense_rows, sparse, colbert):
+                    yield PointStruct(
+                        id=str(uuid.uuid5(POINT_ID_NAMESPACE, text)),
+                        payload={"text": text},
+                        vector={
+                            "all-MiniLM-L6-v2": dense_row,
+                            "bm25": sparse_vec.as_object(),
+                            "colbertv2.0": colbert_vec.tolist(),
+                        }
+                    )
+
+    def stream_index(self, batch_size=64, parallel=1):
+        """Embed and upload the chunks batch by batch, so only one batch of vectors is held in memory"""
+        print(f"[INFO] Embedding and inserting {len(self.chunks)} points into Qdrant in batches of {batch_size}...")
+        self.cache_hits = 0
+        # qdrant-client batches the point stream itself, retrying failed
+        # batches. parallel > 1 forks that many upload processes per call,
+        # which a PDF of a few batches (already inside a PDF worker) never
+        # pays back, so uploads stay on the shared gRPC client by default.
+        self.client.upload_points(
+            collection_name=self.collection_name,
+            points=tqdm(self._iter_points(batch_size), total=len(self.chunks), desc="Indexing points"),
+            batch_size=batch_size,
+            parallel=parallel,
+            wait=True
+        )
+        if self.embedding_store is not None:
+            print(f"[INFO] {self.cache_hits} chunks found in the embedding cache")
         print("[SUCCESS] All data inserted into Qdrant successfully.")
 
     def run(self):
         try:
             self.load_chunks()
             self.setup_collection()
-            self.embed_texts()
-            self.insert_into_qdrant()
+            self.stream_index()
         except Exception as e:
             print(f"[ERROR] {e}")
             return False
@@ -1,16 +1,72 @@
+import os
+import re
+import numpy as np
+import onnxruntime as ort
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 
+# int8 ONNX export of the fine-tuned model, written by quantizeModel.py
+INTENT_ONNX_FILENAME = "model_int8.onnx"
+
+# Cheap prefilter: only a bare imperative asking to summarise the whole
+# document ("summarize the document", "give me a summary of this pdf") is
+# labelled without running the model. The pattern must match the entire
+# query, so anything with a topic or scope ("...about X", "...'s methodology")
+# or phrased as a question goes to the classifier.
+_WHOLE_DOCUMENT_SUMMARY_RE = re.compile(
+    r"(?:please\s+)?(?:can\s+you\s+|could\s+you\s+)?(?:please\s+)?"
+    r"(?:summari[sz]e|tl;?dr|(?:give|provide|write)\s+(?:me\s+)?(?:a|an)\s+(?:short\s+|brief\s+)?(?:summary|overview|tl;?dr)\s+of)"
+    r"\s+(?:the|this)\s+(?:whole\s+|entire\s+|full\s+|complete\s+)?(?:document|doc|pdf|paper|file)"
+    r"(?:\s+please)?\s*[.!?]?",
+    re.I
+)
+
 class IntentClassifier:
-    def __init__(self, model_path=r"/Users/harshvardhan/RagChatbot/fine_tuned_model"):
+    def __init__(self, model_path=r"/Users/harshvardhan/RagChatbot/fine_tuned_model", num_threads=None):
         self.id2label = {0: "Q&A", 1: "Summarize Full Document"}
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
-        self.model.eval()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True)
+        self.session = None
+        self.model = None
+
+        onnx_path = os.path.join(model_path, INTENT_ONNX_FILENAME)
+        if os.path.exists(onnx_path):
+            # One persistent ONNX Runtime session running the int8 graph
+            options = ort.SessionOptions()
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = [i.name for i in self.session.get_inputs()]
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+            self.model.eval()
+
+    @staticmethod
+    def _prefilter(query: str):
+        if _WHOLE_DOCUMENT_SUMMARY_RE.fullmatch(query.strip()):
+            return "Summarize Full Document"
+        return None
+
+    def _classify(self, queries):
+        if self.session is not None:
+            inputs = self.tokenizer(queries, return_tensors="np", truncation=True, padding=True, max_length=128)
+            feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+            logits = self.session.run(None, feed)[0]
+            predicted = np.argmax(logits, axis=1).tolist()
+        else:
+            inputs = self.tokenizer(queries, return_tensors="pt", truncation=True, padding=True, max_length=128)
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+                predicted = torch.argmax(outputs.logits, dim=1).tolist()
+        return [self.id2label[predicted_class] for predicted_class in predicted]
+
+    def predict_intents(self, queries):
+        """Classify several queries, running the ones the prefilter cannot settle as one padded batch"""
+        intents = [self._prefilter(query) for query in queries]
+        pending = [i for i, intent in enumerate(intents) if intent is None]
+        if pending:
+            for i, intent in zip(pending, self._classify([queries[i] for i in pending])):
+                intents[i] = intent
+        return intents
 
     def predict_intent(self, query: str) -> str:
-        inputs = self.tokenizer(query, return_tensors="pt", truncation=True, padding=True, max_length=128)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            predicted_class = torch.argmax(outputs.logits, dim=1).item()
-        return self.id2label[predicted_class]
+        return self.predict_intents([query])[0]
@@ -0,0 +1,25 @@
+from functools import lru_cache
+from qdrant_client import QdrantClient
+
+
+def get_qdrant_client(host="localhost", port=6333, timeout=60.0, grpc_port=6334, prefer_grpc=True):
+    """
+    Return the process-wide QdrantClient for a server. Retrieval and
+    indexing share it, so its connection pool is reused instead of being
+    rebuilt for every chatbot or upload. Requests go over gRPC (protobuf on
+    one HTTP/2 channel) rather than REST/JSON unless prefer_grpc is False.
+    """
+    # Cache on the fully resolved arguments, so callers that rely on the
+    # defaults and callers that spell them out get the same client
+    return _cached_client(host, int(port), float(timeout), int(grpc_port), bool(prefer_grpc))
+
+
+@lru_cache(maxsize=4)
+def _cached_client(host, port, timeout, grpc_port, prefer_grpc):
+    return QdrantClient(
+        host=host,
+        port=port,
+        grpc_port=grpc_port,
+        prefer_grpc=prefer_grpc,
+        timeout=timeout
+    )
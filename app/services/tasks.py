@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .extract import PDFRAGProcessor
+from .index import QdrantRAGUploader
+
+PDF_WORKERS = 2
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """
+    Process pool for PDF ingestion, started on first use. Chunking and
+    embedding are CPU heavy, so they run outside the web server process;
+    each worker keeps its embedding models loaded between uploads.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def run_in_pdf_pool(fn, *args):
+    """
+    Run fn(*args) in the PDF pool and return its result. If a worker died
+    (e.g. killed for running out of memory), the pool is unusable from then
+    on, so it is dropped and the next call starts a fresh one.
+    """
+    global _pdf_pool
+    pool = get_pdf_pool()
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _pdf_pool_lock:
+            if _pdf_pool is pool:
+                _pdf_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def chunk_pdf(file_path, output_dir):
+    """Chunk a PDF into output_dir and return the path of the chunks file"""
+    processor = PDFRAGProcessor(
+        chunk_size=1000,
+        chunk_overlap=200,
+        output_dir=output_dir
+    )
+    processor.process_pdf_for_rag(pdf_path=file_path, save_format="jsonl")
+    return os.path.join(output_dir, "rag_chunks.jsonl")
+
+
+def index_chunks(chunks_path, collection_name, qdrant_prefer_grpc=True, qdrant_grpc_port=6334):
+    """Embed a chunks file and upload it to a Qdrant collection"""
+    indexer = QdrantRAGUploader(
+        file_path=chunks_path,
+        collection_name=collection_name,
+        grpc_port=qdrant_grpc_port,
+        prefer_grpc=qdrant_prefer_grpc
+    )
+    return indexer.run()
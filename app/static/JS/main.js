@@ -329,16 +329,15 @@ async function handleChatSubmit(e) {
       currentChatId = chatData.id;
     }
 
-    // Send user message to backend
-    const res = await fetch(`/api/chats/${currentChatId}/messages`, {
+    // Send user message to backend and stream the reply
+    const res = await fetch(`/api/chats/${currentChatId}/messages/stream`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ text: message, collection_name: currentCollectionName }),
     });
 
-    typingElement.remove();
-
     if (!res.ok) {
+      typingElement.remove();
       const errData = await res.json();
       addMessage(
         errData.message || "Sorry, I encountered an error. Please try again.",
@@ -347,9 +346,25 @@ async function handleChatSubmit(e) {
       return;
     }
 
-    const data = await res.json();
-    // Add AI response with typing effect
-    await addMessageWithTypingEffect(data.bot_message.text, "ai");
+    // Render tokens as they arrive
+    let messageText = null;
+    let botText = "";
+    await readEventStream(res, (event, data) => {
+      if (event === "error") {
+        throw new Error(data.message);
+      }
+      if (event === "message") {
+        if (!messageText) {
+          typingElement.remove();
+          messageText = addMessage("", "ai").querySelector(".message-content > div");
+        }
+        botText += data.delta;
+        messageText.textContent = botText;
+        scrollToBottom();
+      }
+    });
+
+    typingElement.remove();
   } catch (error) {
     typingElement.remove();
     addMessage("Sorry, I encountered an error. Please try again.", "ai");
@@ -361,6 +376,31 @@ async function handleChatSubmit(e) {
   }
 }
 
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const rawEvents = buffer.split("\n\n");
+    buffer = rawEvents.pop();
+
+    rawEvents.forEach((rawEvent) => {
+      let event = "message";
+      let data = "";
+      rawEvent.split("\n").forEach((line) => {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    });
+  }
+}
+
 function addMessage(content, type) {
   const messageDiv = document.createElement("div");
   messageDiv.className = `message ${type}`;
@@ -420,48 +460,6 @@ function addTypingIndicator() {
   return messageDiv;
 }
 
-async function addMessageWithTypingEffect(content, type) {
-  const messageDiv = document.createElement("div");
-  messageDiv.className = `message ${type}`;
-
-  const avatar = document.createElement("div");
-  avatar.className = "message-avatar";
-  avatar.textContent = type === "user" ? "You" : "AI";
-
-  const messageContent = document.createElement("div");
-  messageContent.className = "message-content";
-
-  const messageText = document.createElement("div");
-  const messageTime = document.createElement("div");
-  messageTime.className = "message-time";
-  messageTime.textContent = formatTime(new Date());
-
-  messageContent.appendChild(messageText);
-  messageContent.appendChild(messageTime);
-  messageDiv.appendChild(avatar);
-  messageDiv.appendChild(messageContent);
-
-  chatMessages.appendChild(messageDiv);
-
-  // Typing effect
-  let i = 0;
-  const typingSpeed = 10;
-
-  return new Promise((resolve) => {
-    function typeWriter() {
-      if (i < content.length) {
-        messageText.textContent += content.charAt(i);
-        i++;
-        scrollToBottom();
-        setTimeout(typeWriter, typingSpeed);
-      } else {
-        resolve(messageDiv);
-      }
-    }
-    typeWriter();
-  });
-}
-
 function scrollToBottom() {
   chatMessages.scrollTop = chatMessages.scrollHeight;
 }
@@ -0,0 +1,60 @@
+import os
+import shutil
+import torch
+from fastembed import TextEmbedding
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+OUTPUT_DIR = "./quantized_models/all-MiniLM-L6-v2-int8"
+
+INTENT_MODEL_DIR = "./fine_tuned_model"
+INTENT_ONNX_FILENAME = "model_int8.onnx"
+
+# Download (or reuse) the fp32 ONNX export that fastembed ships for the model
+fp32_dir = TextEmbedding(MODEL_NAME).model._model_dir
+
+# Copy tokenizer and config files next to the quantized graph
+shutil.copytree(fp32_dir, OUTPUT_DIR, dirs_exist_ok=True)
+os.remove(os.path.join(OUTPUT_DIR, "model.onnx"))
+
+# Dynamic int8 quantization of the encoder weights
+quantize_dynamic(
+    os.path.join(fp32_dir, "model.onnx"),
+    os.path.join(OUTPUT_DIR, "model.onnx"),
+    weight_type=QuantType.QInt8,
+)
+
+print(f"Saved int8 model to {OUTPUT_DIR}")
+
+# Export the fine-tuned intent classifier (trainModel.py) to ONNX with
+# dynamic batch/sequence axes, then quantize it the same way
+if os.path.isdir(INTENT_MODEL_DIR):
+    tokenizer = AutoTokenizer.from_pretrained(INTENT_MODEL_DIR)
+    model = AutoModelForSequenceClassification.from_pretrained(INTENT_MODEL_DIR)
+    model.eval()
+
+    fp32_path = os.path.join(INTENT_MODEL_DIR, "model.onnx")
+    sample = tokenizer("summarize the document", return_tensors="pt")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+    )
+
+    quantize_dynamic(
+        fp32_path,
+        os.path.join(INTENT_MODEL_DIR, INTENT_ONNX_FILENAME),
+        weight_type=QuantType.QInt8,
+    )
+    os.remove(fp32_path)
+
+    print(f"Saved int8 intent model to {INTENT_MODEL_DIR}/{INTENT_ONNX_FILENAME}")
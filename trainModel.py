@@ -1,6 +1,9 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments
-from datasets import load_dataset
-from sklearn.metrics import accuracy_score, f1_score
+import numpy as np
+import torch
+from transformers import (
+    AutoTokenizer, AutoModelForSequenceClassification, DataCollatorWithPadding, Trainer, TrainingArguments
+)
+from datasets import ClassLabel, load_dataset
 
 # Load CSV dataset
 data = load_dataset('csv', data_files=r'/Users/harshvardhan/RagChatbot/query_classification_dataset_1000.csv')
@@ -10,20 +13,28 @@ raw_dataset = data[list(data.keys())[0]]  # usually 'train'
 label2id = {"Q&A": 0, "Summarize Full Document": 1}
 id2label = {v: k for k, v in label2id.items()}
 
+# Encode the label column once, keeping the ids above (unknown labels fail the cast)
+raw_dataset = raw_dataset.cast_column("label", ClassLabel(names=list(label2id)))
+raw_dataset = raw_dataset.rename_column("label", "labels")
+
 # Load tokenizer
-tokenizer = AutoTokenizer.from_pretrained('distilbert-base-uncased')
+tokenizer = AutoTokenizer.from_pretrained('distilbert-base-uncased', use_fast=True)
 
-# Tokenization function
-def tokenize(example):
-    example["labels"] = label2id[example["label"]]
-    return tokenizer(example["text"], truncation=True, padding="max_length", max_length=128)
+# Tokenization function (batched: the fast tokenizer handles a whole list at once)
+def tokenize(batch):
+    # No padding here: the collator pads each batch to its own longest query
+    return tokenizer(batch["text"], truncation=True, max_length=128)
 
 # Split into train/test
 split_dataset = raw_dataset.train_test_split(test_size=0.2, seed=42)
 
 # Tokenize both train and test
-tokenized_dataset = split_dataset.map(tokenize)
-tokenized_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
+tokenized_dataset = split_dataset.map(
+    tokenize,
+    batched=True,
+    batch_size=1000,
+    remove_columns=["text"]
+)
 
 # Load model for 2-label classification
 model = AutoModelForSequenceClassification.from_pretrained(
@@ -33,23 +44,43 @@ model = AutoModelForSequenceClassification.from_pretrained(
     label2id=label2id
 )
 
-# Define metrics
+# Define metrics (numpy only: confusion matrix via bincount, support-weighted F1)
 def compute_metrics(p):
     preds = p.predictions.argmax(-1)
     labels = p.label_ids
+    num_labels = len(label2id)
+    confusion = np.bincount(labels * num_labels + preds, minlength=num_labels ** 2).reshape(num_labels, num_labels)
+    tp = np.diag(confusion)
+    support = confusion.sum(axis=1)
+    denom = support + confusion.sum(axis=0)
+    f1 = np.divide(2 * tp, denom, out=np.zeros(num_labels), where=denom > 0)
     return {
-        "accuracy": accuracy_score(labels, preds),
-        "f1": f1_score(labels, preds, average="weighted")
+        "accuracy": float(tp.sum() / max(len(labels), 1)),
+        "f1": float((f1 * support).sum() / max(support.sum(), 1))
     }
 
+# Mixed precision on GPU: bf16 + TF32 on Ampere+ (compute capability 8.x), fp16 otherwise
+use_cuda = torch.cuda.is_available()
+use_bf16 = use_cuda and torch.cuda.get_device_capability()[0] >= 8
+
 # Training arguments
 training_args = TrainingArguments(
     output_dir='./results',
     num_train_epochs=4,
-    per_device_train_batch_size=16,
+    per_device_train_batch_size=64,
+    gradient_accumulation_steps=1,
+    # 4x the old batch of 16 means 4x fewer optimizer steps over the same
+    # epochs: scale the default 5e-5 learning rate by sqrt(4) and warm up
+    learning_rate=1e-4,
+    warmup_ratio=0.1,
+    bf16=use_bf16,
+    fp16=use_cuda and not use_bf16,
+    tf32=use_bf16,
+    optim='adamw_torch_fused' if use_cuda else 'adamw_torch',
+    dataloader_pin_memory=use_cuda,
     do_eval=True,
-    logging_steps=50,
-    save_steps=100,
+    logging_steps=12,  # same cadence per epoch as 50/100 steps at batch 16
+    save_steps=25,
 )
 
 # Trainer
@@ -58,6 +89,7 @@ trainer = Trainer(
     args=training_args,
     train_dataset=tokenized_dataset["train"],
     eval_dataset=tokenized_dataset["test"],
+    data_collator=DataCollatorWithPadding(tokenizer),
     compute_metrics=compute_metrics
 )
 